@@ -0,0 +1,105 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field, ConfigDict
+from typing import List
+import os
+import uuid
+import logging
+from datetime import datetime, timezone
+from common import db, get_current_user, user_rate_limit
+from rate_limit import Rate
+from llm import ask_llm
+
+# AI routes, mounted by the core app (server.py) or on their own (ai_server.py)
+
+RATE_LIMIT_AI = Rate.parse(os.environ.get('RATE_LIMIT_AI', '10/minute'))
+
+ai_router = APIRouter(prefix="/api")
+
+# ============ MODELS ============
+
+class MentorChat(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: str
+    sessionId: str
+    role: str  # user or assistant
+    message: str
+    timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class MentorChatCreate(BaseModel):
+    sessionId: str
+    message: str
+
+class SummarizeRequest(BaseModel):
+    text: str
+
+# ============ AI MENTOR ROUTES ============
+
+@ai_router.post("/ai/mentor", dependencies=[user_rate_limit("ai", RATE_LIMIT_AI)])
+async def ai_mentor_chat(
+    chat_request: MentorChatCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    # Save user message
+    user_chat = MentorChat(
+        userId=current_user["id"],
+        sessionId=chat_request.sessionId,
+        role="user",
+        message=chat_request.message
+    )
+    await db.mentorChats.insert_one(user_chat.model_dump())
+    
+    # Get chat history for context
+    chat_history = await db.mentorChats.find(
+        {"userId": current_user["id"], "sessionId": chat_request.sessionId},
+        {"_id": 0}
+    ).sort("timestamp", 1).limit(10).to_list(10)
+    
+    try:
+        response = await ask_llm(
+            session_id=chat_request.sessionId,
+            system_message="You are a helpful AI study mentor. Help students with study strategies, motivation, time management, and understanding concepts. Be encouraging and supportive.",
+            text=chat_request.message
+        )
+        
+        # Save assistant response
+        assistant_chat = MentorChat(
+            userId=current_user["id"],
+            sessionId=chat_request.sessionId,
+            role="assistant",
+            message=response
+        )
+        await db.mentorChats.insert_one(assistant_chat.model_dump())
+        
+        return {"response": response}
+    except Exception as e:
+        logging.error(f"AI Mentor error: {str(e)}")
+        raise HTTPException(status_code=500, detail="AI service temporarily unavailable")
+
+@ai_router.get("/ai/mentor/history/{session_id}", response_model=List[MentorChat])
+async def get_mentor_history(
+    session_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    history = await db.mentorChats.find(
+        {"userId": current_user["id"], "sessionId": session_id},
+        {"_id": 0}
+    ).sort("timestamp", 1).to_list(1000)
+    return history
+
+@ai_router.post("/ai/summarize", dependencies=[user_rate_limit("ai", RATE_LIMIT_AI)])
+async def summarize_content(
+    request: SummarizeRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        response = await ask_llm(
+            session_id="summary-" + str(uuid.uuid4()),
+            system_message="You are a text summarizer. Provide concise 3-line summaries.",
+            text=f"Summarize this in 3 lines:\n\n{request.text}"
+        )
+        
+        return {"summary": response}
+    except Exception as e:
+        logging.error(f"AI Summarize error: {str(e)}")
+        raise HTTPException(status_code=500, detail="AI service temporarily unavailable")
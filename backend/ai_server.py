@@ -0,0 +1,9 @@
+# AI routes as a separately deployable app: uvicorn ai_server:app
+# Run the core app with SERVE_AI_ROUTES=false and route /api/ai/* here.
+# Only common.py and ai_routes.py are imported, not the core routes.
+from common import create_app
+from ai_routes import ai_router
+from llm import load_llm
+
+# Load the LLM integration before reporting ready
+app = create_app([ai_router], startup=[load_llm])
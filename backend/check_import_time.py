@@ -0,0 +1,82 @@
+"""Import-time budget for the core and AI apps.
+
+Runs `python -X importtime -c "import <entry point>"` in a fresh interpreter
+for server.py and ai_server.py, and fails if an import exceeds
+IMPORT_BUDGET_MS, loads a module that should only be imported on first use,
+or if the AI app pulls in the core routes.
+
+    python check_import_time.py
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 1500))
+LAZY_MODULES = (
+    "emergentintegrations",
+    "litellm",
+    "openai",
+    "google.genai",
+    "google.generativeai",
+    "boto3",
+    "passlib",
+    "bcrypt",
+)
+# Modules each entry point must not import
+FORBIDDEN = {
+    "server": LAZY_MODULES,
+    "ai_server": LAZY_MODULES + ("server", "presence"),
+}
+
+
+def measure(module: str = "server"):
+    env = {
+        **os.environ,
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        "DB_NAME": os.environ.get("DB_NAME", "studysync_db"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    total_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, loaded
+
+
+def main() -> int:
+    failed = False
+    for module, forbidden in FORBIDDEN.items():
+        total_ms, loaded = measure(module)
+        eager = sorted(
+            name for name in loaded
+            if any(name == lazy or name.startswith(lazy + ".") for lazy in forbidden)
+        )
+        print(f"import {module}: {total_ms:.0f} ms, {len(loaded)} modules (budget {BUDGET_MS:.0f} ms)")
+        if total_ms > BUDGET_MS:
+            print(f"FAIL: {module} import time over budget")
+            failed = True
+        if eager:
+            print(f"FAIL: {module} imported: " + ", ".join(eager))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import JSONResponse
+from fastapi.security import OAuth2PasswordBearer
+from dotenv import load_dotenv
+from starlette.middleware.cors import CORSMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Sequence
+from jose import JWTError, jwt
+from rate_limit import Rate, RateLimiter, InMemoryRateLimitStore, MongoRateLimitStore
+
+# Shared by the core app (server.py) and the AI app (ai_server.py): settings,
+# the MongoDB connection, authentication, rate limiting and the app factory.
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection (opened in lifespan so every worker process gets its own pool)
+MONGO_URL = os.environ['MONGO_URL']
+DB_NAME = os.environ['DB_NAME']
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 10))
+client: Optional[AsyncIOMotorClient] = None
+_database = None
+
+class _Database:
+    """Forwards collection access to the database opened in lifespan."""
+
+    def __getattr__(self, name):
+        if _database is None:
+            raise RuntimeError("MongoDB is not connected yet")
+        return getattr(_database, name)
+
+db = _Database()
+
+# JWT Settings
+SECRET_KEY = os.environ.get('JWT_SECRET', 'your-super-secret-jwt-key-change-in-production')
+ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', 1440))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+# "memory" keeps buckets per worker, "mongo" shares them across workers
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+limiter = RateLimiter(InMemoryRateLimitStore())
+
+# Request size limits
+MAX_NOTE_FILE_BYTES = int(os.environ.get('MAX_NOTE_FILE_BYTES', 10 * 1024 * 1024))
+MAX_NOTE_FILE_CHARS = 4 * -(-MAX_NOTE_FILE_BYTES // 3)  # base64-encoded length
+MAX_REQUEST_BODY_BYTES = int(os.environ.get('MAX_REQUEST_BODY_BYTES', MAX_NOTE_FILE_CHARS + 64 * 1024))
+# Every route except note uploads takes small JSON bodies
+MAX_JSON_BODY_BYTES = int(os.environ.get('MAX_JSON_BODY_BYTES', 256 * 1024))
+LARGE_BODY_PATHS = {"/api/notes"}
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ============ AUTH ============
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if user is None:
+        raise credentials_exception
+    return user
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+# ============ RATE LIMITING ============
+
+async def hit_user_rate_limit(scope: str, rate: Rate, current_user: dict):
+    await limiter.hit(f"{scope}:user:{current_user['id']}", rate)
+
+def user_rate_limit(scope: str, rate: Rate):
+    # FastAPI reads and parses the request body before running dependencies;
+    # routes taking large bodies call hit_user_rate_limit before reading it
+    async def dependency(current_user: dict = Depends(get_current_user)):
+        await hit_user_rate_limit(scope, rate, current_user)
+    return Depends(dependency)
+
+def ip_rate_limit(scope: str, rate: Rate):
+    async def dependency(request: Request):
+        # Behind a proxy this is the real client only when the proxy's address
+        # is in the server's forwarded_allow_ips (see gunicorn.conf.py)
+        client_ip = request.client.host if request.client else "unknown"
+        await limiter.hit(f"{scope}:ip:{client_ip}", rate)
+    return Depends(dependency)
+
+# ============ HEALTH ROUTES ============
+
+health_router = APIRouter(prefix="/api")
+
+@health_router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@health_router.get("/health/ready")
+async def readiness():
+    if client is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=2)
+    except Exception as e:
+        logging.error(f"Readiness check failed: {str(e)}")
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready"}
+
+# ============ APP ============
+
+class RequestBodyLimit:
+    """Answers 413 once a request body passes its limit.
+
+    Bodies are capped at `max_bytes`, or `large_max_bytes` for paths in
+    `large_paths`. Declared Content-Length is checked up front; chunked
+    bodies are counted as they are received, so they are never buffered
+    past the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, large_max_bytes: int, large_paths=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.large_max_bytes = large_max_bytes
+        self.large_paths = set(large_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.large_max_bytes if scope["path"] in self.large_paths else self.max_bytes
+        too_large = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                return await too_large(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPException from body parsing as-is
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def create_app(
+    routers: Sequence[APIRouter],
+    startup: Sequence[Callable[[], Awaitable]] = (),
+    background: Sequence[Callable[[], Awaitable]] = ()
+) -> FastAPI:
+    """Build an app serving `routers`.
+
+    `startup` coroutines run once MongoDB is connected, before the app
+    reports ready; `background` coroutines run as tasks until shutdown.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        global client, _database
+        client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE
+        )
+        _database = client[DB_NAME]
+        await client.admin.command("ping")
+
+        if RATE_LIMIT_STORE == 'mongo':
+            limiter.store = MongoRateLimitStore(db.rateLimits)
+        await limiter.store.setup()
+
+        for step in startup:
+            await step()
+        tasks: List[asyncio.Task] = [asyncio.create_task(worker()) for worker in background]
+
+        yield
+
+        # The server has already stopped accepting connections and finished
+        # in-flight requests by the time lifespan shutdown runs
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        client.close()
+        client = None
+        _database = None
+
+    application = FastAPI(lifespan=lifespan)
+    application.include_router(health_router)
+    for router in routers:
+        application.include_router(router)
+
+    application.add_middleware(
+        RequestBodyLimit,
+        max_bytes=MAX_JSON_BODY_BYTES,
+        large_max_bytes=MAX_REQUEST_BODY_BYTES,
+        large_paths=LARGE_BODY_PATHS
+    )
+    application.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Lets browser code read when to retry after a 429
+        expose_headers=["Retry-After"],
+    )
+    return application
@@ -0,0 +1,29 @@
+# Production entry point: gunicorn -c gunicorn.conf.py server:app
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Proxies trusted to set X-Forwarded-For/-Proto. Requests from these addresses
+# get request.client set to the forwarding client, which per-IP rate limits
+# rely on. Set this to the ingress/load balancer addresses.
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Each worker opens its own MongoDB pool in the app lifespan, so the app is
+# imported after forking rather than preloaded in the master.
+preload_app = False
+
+# On SIGTERM each worker stops accepting connections and finishes in-flight
+# requests; workers still busy after this many seconds are killed
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("TIMEOUT", 60))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 1000))
+
+accesslog = "-"
+errorlog = "-"
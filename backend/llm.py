@@ -0,0 +1,32 @@
+import asyncio
+import importlib
+import os
+
+# emergentintegrations pulls in the whole LLM SDK tree (litellm, openai,
+# google-genai, boto3, ...), so it is only imported on the first AI request.
+LLM_MODULE = "emergentintegrations.llm.chat"
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-4o-mini')
+
+_chat_module = None
+_load_lock = asyncio.Lock()
+
+
+async def load_llm():
+    """Import the LLM integration once, off the event loop."""
+    global _chat_module
+    if _chat_module is None:
+        async with _load_lock:
+            if _chat_module is None:
+                _chat_module = await asyncio.to_thread(importlib.import_module, LLM_MODULE)
+    return _chat_module
+
+
+async def ask_llm(session_id: str, system_message: str, text: str) -> str:
+    chat_module = await load_llm()
+    llm_chat = chat_module.LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=session_id,
+        system_message=system_message
+    ).with_model(LLM_PROVIDER, LLM_MODEL)
+    return await llm_chat.send_message(chat_module.UserMessage(text=text))
@@ -0,0 +1,144 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+INDEX_OPTIONS_CONFLICT = 85
+
+
+class RoomPresence(ABC):
+    """Tracks which users are online in each room.
+
+    A user counts as present while their last heartbeat is younger than
+    `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def heartbeat(self, room_id: str, user_id: str):
+        ...
+
+    @abstractmethod
+    async def leave(self, room_id: str, user_id: str):
+        ...
+
+    @abstractmethod
+    async def active_members(self, room_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    async def active_rooms(self, limit: int = 100) -> List[Tuple[str, int]]:
+        """(room_id, online member count) pairs, busiest room first."""
+
+    async def setup(self):
+        pass
+
+    async def sweep(self):
+        """Drop every expired heartbeat."""
+
+
+class InMemoryRoomPresence(RoomPresence):
+    """Per-process presence. Each worker only sees the heartbeats it served.
+
+    Expired entries are dropped lazily when a room is read and by `sweep`.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        super().__init__(ttl)
+        self._rooms: Dict[str, Dict[str, float]] = {}
+
+    async def heartbeat(self, room_id: str, user_id: str):
+        self._rooms.setdefault(room_id, {})[user_id] = time.monotonic()
+
+    async def leave(self, room_id: str, user_id: str):
+        members = self._rooms.get(room_id)
+        if members is not None:
+            members.pop(user_id, None)
+            if not members:
+                del self._rooms[room_id]
+
+    async def active_members(self, room_id: str) -> List[str]:
+        members = self._rooms.get(room_id)
+        if not members:
+            return []
+        self._expire(room_id, members, time.monotonic())
+        return list(members)
+
+    async def active_rooms(self, limit: int = 100) -> List[Tuple[str, int]]:
+        await self.sweep()
+        counts = [(room_id, len(members)) for room_id, members in self._rooms.items()]
+        counts.sort(key=lambda item: item[1], reverse=True)
+        return counts[:limit]
+
+    async def sweep(self):
+        now = time.monotonic()
+        for room_id, members in list(self._rooms.items()):
+            self._expire(room_id, members, now)
+
+    def _expire(self, room_id: str, members: Dict[str, float], now: float):
+        cutoff = now - self.ttl
+        for user_id in [uid for uid, seen in members.items() if seen < cutoff]:
+            del members[user_id]
+        if not members:
+            self._rooms.pop(room_id, None)
+
+
+class MongoRoomPresence(RoomPresence):
+    """Presence shared by every worker, one document per (room, user).
+
+    A TTL index removes stale documents; reads also filter on the heartbeat
+    time because the TTL monitor only runs about once a minute.
+    """
+
+    def __init__(self, collection, ttl: float = 30.0):
+        super().__init__(ttl)
+        self.collection = collection
+
+    async def setup(self):
+        await self.collection.create_index([("roomId", ASCENDING), ("userId", ASCENDING)], unique=True)
+        expire_after = max(1, int(self.ttl))
+        try:
+            await self.collection.create_index("lastSeen", expireAfterSeconds=expire_after)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            # PRESENCE_TTL_SECONDS changed since the index was built
+            await self.collection.database.command(
+                "collMod",
+                self.collection.name,
+                index={"keyPattern": {"lastSeen": 1}, "expireAfterSeconds": expire_after}
+            )
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+
+    async def heartbeat(self, room_id: str, user_id: str):
+        await self.collection.update_one(
+            {"roomId": room_id, "userId": user_id},
+            {"$set": {"lastSeen": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def leave(self, room_id: str, user_id: str):
+        await self.collection.delete_one({"roomId": room_id, "userId": user_id})
+
+    async def active_members(self, room_id: str) -> List[str]:
+        docs = await self.collection.find(
+            {"roomId": room_id, "lastSeen": {"$gte": self._cutoff()}},
+            {"_id": 0, "userId": 1}
+        ).to_list(1000)
+        return [doc["userId"] for doc in docs]
+
+    async def active_rooms(self, limit: int = 100) -> List[Tuple[str, int]]:
+        docs = await self.collection.aggregate([
+            {"$match": {"lastSeen": {"$gte": self._cutoff()}}},
+            {"$group": {"_id": "$roomId", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit},
+        ]).to_list(limit)
+        return [(doc["_id"], doc["count"]) for doc in docs]
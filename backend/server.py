@@ -1,39 +1,42 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Depends, Request, status, UploadFile, File
+from fastapi.exceptions import RequestValidationError
+from fastapi.security import OAuth2PasswordRequestForm
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
-import logging
-from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+import asyncio
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from jose import jwt
 import base64
+from common import (
+    db, create_app, get_current_user, get_admin_user, user_rate_limit, ip_rate_limit, hit_user_rate_limit,
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, MAX_NOTE_FILE_CHARS,
+)
+from rate_limit import Rate
+from presence import InMemoryRoomPresence, MongoRoomPresence
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Password hashing (passlib and bcrypt are imported on first use)
+_pwd_context = None
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Rate limiting (token buckets, "<requests>/<second|minute|hour|day>")
+RATE_LIMIT_AUTH = Rate.parse(os.environ.get('RATE_LIMIT_AUTH', '10/minute'))
+RATE_LIMIT_WRITE = Rate.parse(os.environ.get('RATE_LIMIT_WRITE', '60/minute'))
+RATE_LIMIT_MESSAGES = Rate.parse(os.environ.get('RATE_LIMIT_MESSAGES', '30/minute'))
+RATE_LIMIT_NOTES = Rate.parse(os.environ.get('RATE_LIMIT_NOTES', '10/minute'))
+RATE_LIMIT_PRESENCE = Rate.parse(os.environ.get('RATE_LIMIT_PRESENCE', '60/minute'))
 
-# JWT Settings
-SECRET_KEY = os.environ.get('JWT_SECRET', 'your-super-secret-jwt-key-change-in-production')
-ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', 1440))
+# Room presence (users count as online until their heartbeat is this old)
+PRESENCE_TTL_SECONDS = float(os.environ.get('PRESENCE_TTL_SECONDS', 30))
+# "memory" tracks presence per worker, "mongo" shares it across workers
+PRESENCE_STORE = os.environ.get('PRESENCE_STORE', 'memory')
+room_presence = InMemoryRoomPresence(ttl=PRESENCE_TTL_SECONDS)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Set to false when the AI routes are deployed separately (see ai_server.py)
+SERVE_AI_ROUTES = os.environ.get('SERVE_AI_ROUTES', 'true').lower() == 'true'
 
-# Create the main app
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 # ============ MODELS ============
@@ -122,7 +125,7 @@ class NoteCreate(BaseModel):
     title: str
     subject: Optional[str] = None
     content: Optional[str] = None
-    fileData: Optional[str] = None
+    fileData: Optional[str] = Field(default=None, max_length=MAX_NOTE_FILE_CHARS)
     fileName: Optional[str] = None
     fileType: Optional[str] = None
 
@@ -132,12 +135,25 @@ class CollabRoom(BaseModel):
     topic: str
     createdBy: str
     createdByName: str
-    members: List[str] = Field(default_factory=list)
+    memberCount: int = 0
     createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class CollabRoomCreate(BaseModel):
     topic: str
 
+class RoomMember(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    roomId: str
+    userId: str
+    joinedAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class ActiveRoom(CollabRoom):
+    activeMembers: int
+
+class RoomPresenceResponse(BaseModel):
+    roomId: str
+    activeMembers: List[str]
+
 class Message(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -150,19 +166,6 @@ class Message(BaseModel):
 class MessageCreate(BaseModel):
     text: str
 
-class MentorChat(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    userId: str
-    sessionId: str
-    role: str  # user or assistant
-    message: str
-    timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-
-class MentorChatCreate(BaseModel):
-    sessionId: str
-    message: str
-
 class AdminLog(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -179,16 +182,20 @@ class AdminAction(BaseModel):
 class UpdateRole(BaseModel):
     role: str
 
-class SummarizeRequest(BaseModel):
-    text: str
-
 # ============ AUTH UTILITIES ============
 
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -197,36 +204,9 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if user is None:
-        raise credentials_exception
-    return user
-
-async def get_admin_user(current_user: dict = Depends(get_current_user)):
-    if current_user.get("role") != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    return current_user
-
 # ============ AUTH ROUTES ============
 
-@api_router.post("/auth/register", response_model=Token)
+@api_router.post("/auth/register", response_model=Token, dependencies=[ip_rate_limit("auth", RATE_LIMIT_AUTH)])
 async def register(user: UserCreate):
     # Check if user exists
     existing_user = await db.users.find_one({"email": user.email}, {"_id": 0})
@@ -262,7 +242,7 @@ async def register(user: UserCreate):
     
     return Token(access_token=access_token, token_type="bearer", user=user_response)
 
-@api_router.post("/auth/login", response_model=Token)
+@api_router.post("/auth/login", response_model=Token, dependencies=[ip_rate_limit("auth", RATE_LIMIT_AUTH)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await db.users.find_one({"email": form_data.username}, {"_id": 0})
     if not user or not verify_password(form_data.password, user["password"]):
@@ -304,7 +284,7 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 
 # ============ FOCUS ROUTES ============
 
-@api_router.post("/focus/sessions", response_model=FocusSession)
+@api_router.post("/focus/sessions", response_model=FocusSession, dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def create_focus_session(
     session: FocusSessionCreate,
     current_user: dict = Depends(get_current_user)
@@ -328,7 +308,7 @@ async def get_focus_sessions(current_user: dict = Depends(get_current_user)):
 
 # ============ TASK ROUTES ============
 
-@api_router.post("/tasks", response_model=Task)
+@api_router.post("/tasks", response_model=Task, dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def create_task(
     task: TaskCreate,
     current_user: dict = Depends(get_current_user)
@@ -349,7 +329,7 @@ async def get_tasks(current_user: dict = Depends(get_current_user)):
     ).to_list(1000)
     return tasks
 
-@api_router.patch("/tasks/{task_id}", response_model=Task)
+@api_router.patch("/tasks/{task_id}", response_model=Task, dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def update_task(
     task_id: str,
     task_update: TaskUpdate,
@@ -372,7 +352,7 @@ async def update_task(
     
     return Task(**result)
 
-@api_router.delete("/tasks/{task_id}")
+@api_router.delete("/tasks/{task_id}", dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def delete_task(
     task_id: str,
     current_user: dict = Depends(get_current_user)
@@ -384,11 +364,26 @@ async def delete_task(
 
 # ============ NOTES ROUTES ============
 
-@api_router.post("/notes", response_model=Note)
+@api_router.post(
+    "/notes",
+    response_model=Note,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": NoteCreate.model_json_schema()}}
+    }}
+)
 async def create_note(
-    note: NoteCreate,
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
+    # The body is read only after the rate limit passes, so a throttled
+    # client cannot make the worker receive and parse multi-MB uploads
+    await hit_user_rate_limit("notes", RATE_LIMIT_NOTES, current_user)
+    try:
+        note = NoteCreate.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
     new_note = Note(
         userId=current_user["id"],
         uploaderName=current_user["name"],
@@ -421,7 +416,7 @@ async def get_note(
     
     return Note(**note)
 
-@api_router.delete("/notes/{note_id}")
+@api_router.delete("/notes/{note_id}", dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def delete_note(
     note_id: str,
     current_user: dict = Depends(get_current_user)
@@ -438,7 +433,7 @@ async def delete_note(
 
 # ============ COLLAB ROUTES ============
 
-@api_router.post("/collab/rooms", response_model=CollabRoom)
+@api_router.post("/collab/rooms", response_model=CollabRoom, dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def create_room(
     room: CollabRoomCreate,
     current_user: dict = Depends(get_current_user)
@@ -447,10 +442,14 @@ async def create_room(
         topic=room.topic,
         createdBy=current_user["id"],
         createdByName=current_user["name"],
-        members=[current_user["id"]]
+        memberCount=1
     )
     room_dict = new_room.model_dump()
     await db.collabRooms.insert_one(room_dict)
+    await db.roomMembers.insert_one(
+        RoomMember(roomId=new_room.id, userId=current_user["id"]).model_dump()
+    )
+    await room_presence.heartbeat(new_room.id, current_user["id"])
     return new_room
 
 @api_router.get("/collab/rooms", response_model=List[CollabRoom])
@@ -458,33 +457,106 @@ async def get_rooms(current_user: dict = Depends(get_current_user)):
     rooms = await db.collabRooms.find({}, {"_id": 0}).sort("createdAt", -1).to_list(1000)
     return rooms
 
-@api_router.post("/collab/rooms/{room_id}/join")
+@api_router.get("/collab/rooms/mine", response_model=List[CollabRoom])
+async def get_my_rooms(current_user: dict = Depends(get_current_user)):
+    memberships = await db.roomMembers.find(
+        {"userId": current_user["id"]},
+        {"_id": 0, "roomId": 1}
+    ).sort("joinedAt", -1).to_list(1000)
+    room_ids = [m["roomId"] for m in memberships]
+    rooms = await db.collabRooms.find({"id": {"$in": room_ids}}, {"_id": 0}).to_list(1000)
+    rooms_by_id = {room["id"]: room for room in rooms}
+    return [rooms_by_id[room_id] for room_id in room_ids if room_id in rooms_by_id]
+
+@api_router.get("/collab/rooms/active", response_model=List[ActiveRoom])
+async def get_active_rooms(current_user: dict = Depends(get_current_user)):
+    active = await room_presence.active_rooms(limit=100)
+    rooms = await db.collabRooms.find(
+        {"id": {"$in": [room_id for room_id, _ in active]}},
+        {"_id": 0}
+    ).to_list(100)
+    rooms_by_id = {room["id"]: room for room in rooms}
+    return [
+        ActiveRoom(**rooms_by_id[room_id], activeMembers=count)
+        for room_id, count in active if room_id in rooms_by_id
+    ]
+
+@api_router.post("/collab/rooms/{room_id}/join", dependencies=[user_rate_limit("write", RATE_LIMIT_WRITE)])
 async def join_room(
     room_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    result = await db.collabRooms.update_one(
-        {"id": room_id},
-        {"$addToSet": {"members": current_user["id"]}}
-    )
-    
-    if result.matched_count == 0:
+    room = await db.collabRooms.find_one({"id": room_id}, {"_id": 1})
+    if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
+    try:
+        result = await db.roomMembers.update_one(
+            {"roomId": room_id, "userId": current_user["id"]},
+            {"$setOnInsert": {"joinedAt": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        if result.upserted_id is not None:
+            await db.collabRooms.update_one({"id": room_id}, {"$inc": {"memberCount": 1}})
+    except DuplicateKeyError:
+        # A concurrent join for the same user already created the membership
+        pass
+    
+    await room_presence.heartbeat(room_id, current_user["id"])
     return {"message": "Joined room successfully"}
 
+async def is_room_member(room_id: str, user_id: str) -> bool:
+    membership = await db.roomMembers.find_one({"roomId": room_id, "userId": user_id}, {"_id": 1})
+    return membership is not None
+
+async def require_room_member(room_id: str, user_id: str):
+    if not await is_room_member(room_id, user_id):
+        room = await db.collabRooms.find_one({"id": room_id}, {"_id": 1})
+        if not room:
+            raise HTTPException(status_code=404, detail="Room not found")
+        raise HTTPException(status_code=403, detail="Join the room first")
+
+@api_router.post("/collab/rooms/{room_id}/heartbeat", response_model=RoomPresenceResponse, dependencies=[user_rate_limit("presence", RATE_LIMIT_PRESENCE)])
+async def room_heartbeat(
+    room_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    await require_room_member(room_id, current_user["id"])
+    await room_presence.heartbeat(room_id, current_user["id"])
+    return RoomPresenceResponse(roomId=room_id, activeMembers=await room_presence.active_members(room_id))
+
+@api_router.delete("/collab/rooms/{room_id}/presence")
+async def leave_room_presence(
+    room_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    await require_room_member(room_id, current_user["id"])
+    await room_presence.leave(room_id, current_user["id"])
+    return {"message": "Presence cleared"}
+
+@api_router.get("/collab/rooms/{room_id}/presence", response_model=RoomPresenceResponse)
+async def get_room_presence(
+    room_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    await require_room_member(room_id, current_user["id"])
+    return RoomPresenceResponse(roomId=room_id, activeMembers=await room_presence.active_members(room_id))
+
 @api_router.get("/collab/rooms/{room_id}/messages", response_model=List[Message])
 async def get_messages(
     room_id: str,
     current_user: dict = Depends(get_current_user)
 ):
+    # Clients poll messages while a room is open, so this doubles as a heartbeat
+    if await is_room_member(room_id, current_user["id"]):
+        await room_presence.heartbeat(room_id, current_user["id"])
     messages = await db.messages.find(
         {"roomId": room_id},
         {"_id": 0}
     ).sort("timestamp", 1).to_list(1000)
     return messages
 
-@api_router.post("/collab/rooms/{room_id}/messages", response_model=Message)
+@api_router.post("/collab/rooms/{room_id}/messages", response_model=Message, dependencies=[user_rate_limit("messages", RATE_LIMIT_MESSAGES)])
 async def send_message(
     room_id: str,
     message: MessageCreate,
@@ -500,85 +572,6 @@ async def send_message(
     await db.messages.insert_one(message_dict)
     return new_message
 
-# ============ AI MENTOR ROUTES ============
-
-@api_router.post("/ai/mentor")
-async def ai_mentor_chat(
-    chat_request: MentorChatCreate,
-    current_user: dict = Depends(get_current_user)
-):
-    # Save user message
-    user_chat = MentorChat(
-        userId=current_user["id"],
-        sessionId=chat_request.sessionId,
-        role="user",
-        message=chat_request.message
-    )
-    await db.mentorChats.insert_one(user_chat.model_dump())
-    
-    # Get chat history for context
-    chat_history = await db.mentorChats.find(
-        {"userId": current_user["id"], "sessionId": chat_request.sessionId},
-        {"_id": 0}
-    ).sort("timestamp", 1).limit(10).to_list(10)
-    
-    try:
-        # Initialize LLM chat
-        llm_chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=chat_request.sessionId,
-            system_message="You are a helpful AI study mentor. Help students with study strategies, motivation, time management, and understanding concepts. Be encouraging and supportive."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Send message
-        user_message = UserMessage(text=chat_request.message)
-        response = await llm_chat.send_message(user_message)
-        
-        # Save assistant response
-        assistant_chat = MentorChat(
-            userId=current_user["id"],
-            sessionId=chat_request.sessionId,
-            role="assistant",
-            message=response
-        )
-        await db.mentorChats.insert_one(assistant_chat.model_dump())
-        
-        return {"response": response}
-    except Exception as e:
-        logging.error(f"AI Mentor error: {str(e)}")
-        raise HTTPException(status_code=500, detail="AI service temporarily unavailable")
-
-@api_router.get("/ai/mentor/history/{session_id}", response_model=List[MentorChat])
-async def get_mentor_history(
-    session_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    history = await db.mentorChats.find(
-        {"userId": current_user["id"], "sessionId": session_id},
-        {"_id": 0}
-    ).sort("timestamp", 1).to_list(1000)
-    return history
-
-@api_router.post("/ai/summarize")
-async def summarize_content(
-    request: SummarizeRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    try:
-        llm_chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id="summary-" + str(uuid.uuid4()),
-            system_message="You are a text summarizer. Provide concise 3-line summaries."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=f"Summarize this in 3 lines:\n\n{request.text}")
-        response = await llm_chat.send_message(user_message)
-        
-        return {"summary": response}
-    except Exception as e:
-        logging.error(f"AI Summarize error: {str(e)}")
-        raise HTTPException(status_code=500, detail="AI service temporarily unavailable")
-
 # ============ ADMIN ROUTES ============
 
 @api_router.get("/admin/users", response_model=List[UserResponse])
@@ -715,24 +708,63 @@ async def get_admin_logs(admin_user: dict = Depends(get_admin_user)):
     logs = await db.adminLogs.find({}, {"_id": 0}).sort("timestamp", -1).limit(100).to_list(100)
     return logs
 
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# ============ DATABASE SETUP ============
+
+async def ensure_indexes():
+    await db.collabRooms.create_index("id", unique=True)
+    await db.collabRooms.create_index([("createdAt", DESCENDING)])
+    await db.roomMembers.create_index([("roomId", ASCENDING), ("userId", ASCENDING)], unique=True)
+    await db.roomMembers.create_index([("userId", ASCENDING), ("joinedAt", DESCENDING)])
+
+async def migrate_room_members():
+    # Move members embedded in older room documents into roomMembers. The
+    # marker keeps later worker starts from rescanning collabRooms; workers
+    # racing on the first start are harmless because the upserts are idempotent.
+    if await db.migrations.find_one({"_id": "room_members"}):
+        return
+    async for room in db.collabRooms.find({"members": {"$exists": True}}, {"_id": 0, "id": 1, "members": 1, "createdAt": 1}):
+        member_ids = list(dict.fromkeys(room.get("members") or []))
+        if member_ids:
+            await db.roomMembers.bulk_write([
+                UpdateOne(
+                    {"roomId": room["id"], "userId": user_id},
+                    {"$setOnInsert": {"joinedAt": room.get("createdAt", datetime.now(timezone.utc).isoformat())}},
+                    upsert=True
+                )
+                for user_id in member_ids
+            ], ordered=False)
+        member_count = await db.roomMembers.count_documents({"roomId": room["id"]})
+        await db.collabRooms.update_one(
+            {"id": room["id"]},
+            {"$set": {"memberCount": member_count}, "$unset": {"members": ""}}
+        )
+    await db.migrations.update_one(
+        {"_id": "room_members"},
+        {"$set": {"completedAt": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+async def setup_presence():
+    global room_presence
+    if PRESENCE_STORE == 'mongo':
+        room_presence = MongoRoomPresence(db.roomPresence, ttl=PRESENCE_TTL_SECONDS)
+    await room_presence.setup()
+
+async def sweep_presence():
+    while True:
+        await asyncio.sleep(room_presence.ttl)
+        await room_presence.sweep()
+
+# ============ APP ============
+
+routers = [api_router]
+if SERVE_AI_ROUTES:
+    # Imported only when mounted, so SERVE_AI_ROUTES=false keeps it out of this app
+    from ai_routes import ai_router
+    routers.append(ai_router)
+
+app = create_app(
+    routers,
+    startup=[ensure_indexes, migrate_room_members, setup_presence],
+    background=[sweep_presence]
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
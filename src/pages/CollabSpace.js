@@ -162,7 +162,7 @@ const CollabSpace = () => {
                     <p className="text-xs text-gray-400">by {room.createdByName}</p>
                   </div>
                 </div>
-                <p className="text-xs text-gray-500">{room.members.length} members</p>
+                <p className="text-xs text-gray-500">{room.memberCount} members</p>
               </motion.div>
             ))}
           </div>